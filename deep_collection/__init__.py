@@ -1,6 +1,26 @@
-import operator
-from functools import reduce
+from collections.abc import Mapping
+from collections.abc import Sequence
+from collections.abc import Set
 from functools import wraps
+from weakref import ref
+from weakref import WeakKeyDictionary
+
+try:  # NOTE: compat - dotty_dict. See DeepCollection.__init__
+    from dotty_dict import Dotty as _Dotty
+except ModuleNotFoundError:
+    _Dotty = None
+
+
+# Sentinel for missing values, where None could be a real value.
+_MISSING = object()
+
+# Types whose content is entirely set by __new__, and whose __init__ does nothing.
+_IMMUTABLE = frozenset({tuple, frozenset, bytes, str, int, float})
+
+# Exact types for fast checks in _stringlike and _can_be_deep.
+_EXACT_STRINGLIKE = frozenset({str, bytes, bytearray})
+_EXACT_DEEP = frozenset({dict, list, tuple})
+_EXACT_SCALAR = _EXACT_STRINGLIKE | {int, float, bool, type(None)}
 
 
 def _stringlike(obj):
@@ -12,7 +32,9 @@ def _stringlike(obj):
     >>> _stringlike(1)
     False
     """
-    return any(isinstance(obj, base) for base in (str, bytes, bytearray))
+    if type(obj) in _EXACT_STRINGLIKE:
+        return True
+    return isinstance(obj, (str, bytes, bytearray))
 
 
 def _can_be_deep(obj):
@@ -29,17 +51,52 @@ def _can_be_deep(obj):
     >>> _can_be_deep("a")
     False
     """
+    # Settle the common types without raising from iter. Exact types are a single set
+    # lookup, so try those before isinstance, which is needed for subclasses.
+    obj_type = type(obj)
+    if obj_type in _EXACT_DEEP:
+        return True
+    if obj_type in _EXACT_SCALAR:
+        return False
+    if isinstance(obj, (dict, list, tuple)):
+        return True
+    if isinstance(obj, (str, bytes, bytearray, int, float, type(None))):
+        return False
+
     try:
         iter(obj)
     except TypeError:
         return False
 
-    if _stringlike(obj):
-        return False
-
     return True
 
 
+def _freeze(obj):
+    """Return a hashable stand-in for obj that is the same for equal objects.
+    Raise TypeError if obj can't be frozen.
+
+    >>> _freeze({1: [2, {3}]}) == _freeze({1: [2, {3}]})
+    True
+    >>> _freeze([{1: 2}])
+    (frozenset({(1, 2)}),)
+    """
+    try:
+        hash(obj)
+    except TypeError:
+        pass
+    else:
+        return obj
+
+    if isinstance(obj, Mapping):
+        return frozenset((k, _freeze(v)) for k, v in obj.items())
+    if isinstance(obj, Set):
+        return frozenset(obj)
+    if isinstance(obj, Sequence):
+        return tuple(_freeze(i) for i in obj)
+
+    raise TypeError(f"Cannot freeze type '{type(obj)}'")
+
+
 def del_by_path(obj, path):
     """Delete a key-value in a nested object in root by item sequence.
     from https://stackoverflow.com/a/14692747/913080
@@ -60,7 +117,17 @@ def get_by_path(obj, path):
     >>> get_by_path(obj, ["a", 1, "c"])
     'd'
     """
-    return reduce(operator.getitem, path, obj)
+    # Most paths are short, so index those directly rather than looping.
+    if type(path) in (tuple, list):
+        n = len(path)
+        if n == 1:
+            return obj[path[0]]
+        if n == 2:
+            return obj[path[0]][path[1]]
+
+    for part in path:
+        obj = obj[part]
+    return obj
 
 
 def set_by_path(obj, path, value):
@@ -81,20 +148,26 @@ def set_by_path(obj, path, value):
     >>> obj
     {0: {1: {2: {3: {4: {5: {6: {7: {8: {9: 10}}}}}}}}}}
     """
-    path = list(path)  # needed for later equality checks
+    path = list(path)
+    last = len(path) - 1
 
-    traversed = []
-    for part in path:
-        branch = get_by_path(obj, traversed)
-        traversed.append(part)
+    branch = obj
+    for i, part in enumerate(path):
+        if i == last:
+            branch[part] = value
+            return
 
-        try:
-            branch[part]
-        except (IndexError, KeyError):
-            branch[part] = {}
+        # Only plain dicts, since subclasses may override lookups, e.g. __missing__.
+        if type(branch) is dict:
+            if branch.get(part, _MISSING) is _MISSING:
+                branch[part] = {}
+        else:
+            try:
+                branch[part]
+            except (IndexError, KeyError):
+                branch[part] = {}
 
-        if traversed == path:
-            branch[part] = value
+        branch = branch[part]
 
 
 def paths_to_field(obj, field, current=None):
@@ -121,41 +194,102 @@ def paths_to_field(obj, field, current=None):
     [[0, 'x', 'y']]
     >>> list(paths_to_field({"x": {"y": "value"}}, ["y"]))
     [['x', 'y']]
+    >>> list(paths_to_field({"a": 1, "x": {"y": "value"}}, ["y"]))
+    [['x', 'y']]
+    """
+    for path, _ in _paths_and_values(obj, field, current):
+        yield path
+
+
+def _paths_and_values(obj, field, current=None):
+    """Generate (path, value) for each match of field, as in paths_to_field.
+    Values are taken where they're found, so they needn't be looked up by path again.
+
+    >>> list(_paths_and_values([{"x": {"y": "value"}}], "y"))
+    [([0, 'x', 'y'], 'value')]
+    >>> list(_paths_and_values([{"x": {"y": "value"}}], ["x", "y"]))
+    [([0, 'x', 'y'], 'value')]
     """
-    if current is None:
-        current = []
+    # Paths are built as tuples, which are cheaper to extend, and only made lists
+    # when yielded.
+    current = () if current is None else tuple(current)
 
     if not _can_be_deep(obj):
         raise TypeError(
             f"First argument must be able to be deep, not type '{type(obj)}'"
         )
 
-    # field is compound
-    if _can_be_deep(field):
+    def probe(node):
+        """Return the value at field in node, or _MISSING if there isn't one."""
         try:
-            get_by_path(obj, field)
+            # Most nodes are dicts without the first key, so rule those out early.
+            # A miss is only conclusive for exact dicts, since a subclass could still
+            # produce the value through __missing__.
+            if field and type(node) is dict and field[0] not in node:
+                return _MISSING
+            return get_by_path(node, field)
         except (KeyError, IndexError, TypeError):
-            try:
-                for k, v in obj.items():
-                    yield from paths_to_field(v, field, current + [k])
-            except AttributeError:  # no .items
-                for idx, i in enumerate(obj):
-                    yield from paths_to_field(i, field, current + [idx])
-        else:
-            yield current + list(field)
-    else:  # field is simple; str, int, float, etc.
+            return _MISSING
+
+    def children(node):
+        """Return (iterator of (key, value), whether keys are matched against field).
+        Mappings match on their keys, while sequences match on their elements.
+        """
+        # Dispatch the common types up front to avoid raising for every sequence.
+        if isinstance(node, dict):
+            return iter(node.items()), True
+        if isinstance(node, (list, tuple)):
+            return enumerate(node), False
+
         try:
-            for k, v in obj.items():
-                if k == field:
-                    yield current + [k]
-                if _can_be_deep(v):
-                    yield from paths_to_field(v, field, current + [k])
+            return iter(node.items()), True
         except AttributeError:  # no .items
-            for idx, i in enumerate(obj):
-                if i == field:
-                    yield current + [idx]
-                if _can_be_deep(i):
-                    yield from paths_to_field(i, field, current + [idx])
+            return enumerate(node), False
+
+    compound = _can_be_deep(field)
+    if compound:
+        # Materialize once so the probe and every match can reuse it.
+        field = tuple(field)
+
+        # Probe a DeepCollection's raw object, like the walk below does, so the value
+        # isn't already wrapped by its __getitem__.
+        value = probe(obj._obj if isinstance(obj, DeepCollection) else obj)
+        if value is not _MISSING:
+            yield list(current + field), value
+            return
+
+    # Walk depth first with an explicit stack of partially consumed iterators rather
+    # than recursing, so each level doesn't cost a new generator frame. Descending
+    # breaks out of the parent's loop, which resumes where it left off once the child
+    # is exhausted. This keeps the same ordering as a recursive walk.
+    #
+    # This loop is the hot path when scanning large configs. Globals and methods used
+    # in it are bound to locals, each value is checked for depth once, and paths are
+    # only built for values that match or are descended into.
+    stack = [(current, *children(obj))]
+    push = stack.append
+    pop = stack.pop
+    can_be_deep = _can_be_deep
+    missing = _MISSING
+    while stack:
+        cur, items, match_keys = stack[-1]
+        for k, v in items:
+            deep = can_be_deep(v)
+            if compound:
+                if not deep:
+                    continue
+                value = probe(v)
+                if value is not missing:
+                    yield list(cur + (k,) + field), value
+                    continue
+            elif (k if match_keys else v) == field:
+                yield list(cur + (k,)), v
+
+            if deep:
+                push((cur + (k,), *children(v)))
+                break
+        else:
+            pop()
 
 
 def values_for_field(obj, field):
@@ -163,9 +297,15 @@ def values_for_field(obj, field):
 
     >>> list(values_for_field([{"x": {"y": "value", "z": {"y": "value"}}, "y": {1: 2}}], "y"))
     ['value', 'value', {1: 2}]
+    >>> # values from a DeepCollection are wrapped as its items would be
+    >>> [type(v).__name__ for v in values_for_field(DeepCollection([{"y": {1: 2}}]), "y")]
+    ['DeepCollection']
     """
-    for path in paths_to_field(obj, field):
-        yield get_by_path(obj, path)
+    # Values are taken from the walk rather than looked up through obj, so wrap them
+    # as indexing a DeepCollection would have.
+    wrap = obj._wrap if isinstance(obj, DeepCollection) else None
+    for _, value in _paths_and_values(obj, field):
+        yield value if wrap is None else wrap(value)
 
 
 def deduped_items(items):
@@ -181,8 +321,48 @@ def deduped_items(items):
     try:
         return list(set(items))
     except TypeError:
-        # next line from https://stackoverflow.com/a/9428041
-        return [i for n, i in enumerate(items) if i not in items[n + 1 :]]  # noqa: E203
+        pass
+
+    # Keep the last of each group of equal items, in order. Equal items share a frozen
+    # key, so each item need only be compared against those in its bucket.
+    buckets = {}
+    unfrozen = []
+    deduped = []
+    for item in reversed(items):
+        try:
+            bucket = buckets.setdefault(_freeze(item), [])
+        except TypeError:
+            bucket = unfrozen
+
+        if item not in bucket:
+            bucket.append(item)
+            deduped.append(item)
+
+    deduped.reverse()
+    return deduped
+
+
+# Classes synthesized by DynamicSubclasser, as {cls: {dynamic_parent_cls: ref}}, and
+# metaclasses synthesized to resolve conflicts, as {mcls: {parent_mcls: ref}}. Keys are
+# weak so short-lived types aren't kept alive. Values are weak too, since a synthesized
+# class references its bases and would otherwise keep its own key alive.
+_subclass_cache = WeakKeyDictionary()
+_metaclass_cache = WeakKeyDictionary()
+
+
+def _get_cached(cache, outer, inner):
+    """Return the class cached for outer and inner, or None if it's missing or gone."""
+    class_ref = cache.get(outer, {}).get(inner)
+    return None if class_ref is None else class_ref()
+
+
+def _set_cached(cache, outer, inner, value):
+    cache.setdefault(outer, WeakKeyDictionary())[inner] = ref(value)
+
+
+# Results of DynamicSubclasser.__subclasscheck__, as {cls: {sub: bool}}. These are
+# weak so checks against short-lived classes don't keep them alive.
+_subclass_checks = WeakKeyDictionary()
 
 
 class DynamicSubclasser(type):
@@ -207,13 +387,25 @@ class DynamicSubclasser(type):
 
         # Make a new_cls that inherits from the dynamic_parent_cls, and resolving
         # potential metaclass conflicts if the dynamic_parent_cls doesn't already
-        # use this metaclass.
-        mcls = type(cls)
-        if isinstance(dynamic_parent_cls, mcls):
-            new_cls = type(cls.__name__, (dynamic_parent_cls,), {})
-        else:
-            cls.__class__ = type(mcls.__name__, (mcls, type(dynamic_parent_cls)), {})
-            new_cls = type(cls.__name__, (cls, dynamic_parent_cls), {})
+        # use this metaclass. These are cached, so wrapping many objects of the same
+        # type doesn't build a new class each time.
+        new_cls = _get_cached(_subclass_cache, cls, dynamic_parent_cls)
+        if new_cls is None:
+            mcls = type(cls)
+            parent_mcls = type(dynamic_parent_cls)
+            # Check against DynamicSubclasser rather than mcls, since mcls may have
+            # been swapped for a synthesized metaclass since dynamic_parent_cls was made.
+            if isinstance(dynamic_parent_cls, DynamicSubclasser):
+                new_cls = type(cls.__name__, (dynamic_parent_cls,), {})
+            else:
+                if not issubclass(mcls, parent_mcls):
+                    new_mcls = _get_cached(_metaclass_cache, mcls, parent_mcls)
+                    if new_mcls is None:
+                        new_mcls = type(mcls.__name__, (mcls, parent_mcls), {})
+                        _set_cached(_metaclass_cache, mcls, parent_mcls, new_mcls)
+                    cls.__class__ = new_mcls
+                new_cls = type(cls.__name__, (cls, dynamic_parent_cls), {})
+            _set_cached(_subclass_cache, cls, dynamic_parent_cls, new_cls)
 
         # Create the instance and initialize it with the given object.
         # Sets obj in instance for immutables like `tuple`
@@ -234,7 +426,10 @@ class DynamicSubclasser(type):
         ourselves, we can use the naive method given in
         https://peps.python.org/pep-3119/#overloading-isinstance-and-issubclass
         """
-        return any(cls.__subclasscheck__(c) for c in {type(inst), inst.__class__})
+        inst_cls = type(inst)
+        return cls.__subclasscheck__(inst_cls) or (
+            inst.__class__ is not inst_cls and cls.__subclasscheck__(inst.__class__)
+        )
 
     def __subclasscheck__(cls, sub):
         """If the dynamic parent subclasses an abc (like UserList), the result
@@ -246,8 +441,15 @@ class DynamicSubclasser(type):
         ourselves, we can use the naive method given in
         https://peps.python.org/pep-3119/#overloading-isinstance-and-issubclass
         """
-        candidates = cls.__dict__.get("__subclass__", set()) | {cls}
-        return any(c in candidates for c in sub.mro())
+        checks = _subclass_checks.get(cls)
+        if checks is None:
+            checks = _subclass_checks[cls] = WeakKeyDictionary()
+
+        result = checks.get(sub)
+        if result is None:
+            candidates = cls.__dict__.get("__subclass__", set()) | {cls}
+            result = checks[sub] = any(c in candidates for c in sub.mro())
+        return result
 
 
 class DeepCollection(metaclass=DynamicSubclasser):
@@ -258,34 +460,58 @@ class DeepCollection(metaclass=DynamicSubclasser):
     'j'
     """
 
+    # Names of inherited methods that may mutate self, and so need self._obj synced
+    # after they're called, when the dynamic parent is exactly a dict, list, or set.
+    # Their other methods are returned unwrapped. Any other parent could mutate from
+    # any public method, so all of those are wrapped.
+    _MUTATING = frozenset(
+        {
+            "add",
+            "append",
+            "clear",
+            "difference_update",
+            "discard",
+            "extend",
+            "insert",
+            "intersection_update",
+            "pop",
+            "popitem",
+            "remove",
+            "reverse",
+            "setdefault",
+            "sort",
+            "symmetric_difference_update",
+            "update",
+        }
+    )
+
     def __init__(self, obj, *args, return_deep=True, **kwargs):
         # This often sets the original value for `self` for mutable types.
         # I.e. it gives a new list its content.
-        # Immutables like tuples often already have the base class set via __new__.
+        # Immutables like tuples already have the base class set via __new__, so
+        # skip the attempt for exact known immutables rather than raising and catching.
+        # Subclasses may define their own __init__, so they still get called.
 
-        try:
-            super().__init__(obj, *args, **kwargs)
-        except TypeError:  # self is immutable - like a tuple
-            pass
-        except AttributeError as e:
-            # NOTE: compat - dotty_dict
-            # This amounts to a token compatibility with dotty_dict. Many methods and
-            # features overlap. Try to prefer ours, and fall back to theirs.
-            #
-            # dotty_dict enforces an instance check on its first arg that dotty_dict
-            # itself fails.
-            #
-            # Can't test for dotty without dotty available. If that's the case, fall
-            # back to the original AttributeError because we can't tell why we get it.
+        if type(obj) not in _IMMUTABLE:
             try:
-                from dotty_dict import Dotty
-            except ModuleNotFoundError:
-                raise e
-
-            if isinstance(obj, Dotty):
-                super().__init__(obj.to_dict(), *args, **kwargs)
-            else:  # We have Dotty available, but that's not obj.
-                raise e
+                super().__init__(obj, *args, **kwargs)
+            except TypeError:  # self is immutable - like a tuple
+                pass
+            except AttributeError as e:
+                # NOTE: compat - dotty_dict
+                # This amounts to a token compatibility with dotty_dict. Many methods
+                # and features overlap. Try to prefer ours, and fall back to theirs.
+                #
+                # dotty_dict enforces an instance check on its first arg that
+                # dotty_dict itself fails.
+                #
+                # Can't test for dotty without dotty available. If that's the case,
+                # fall back to the original AttributeError because we can't tell why
+                # we get it.
+                if _Dotty is not None and isinstance(obj, _Dotty):
+                    super().__init__(obj.to_dict(), *args, **kwargs)
+                else:  # Either dotty isn't available, or that's not obj.
+                    raise e
 
         # self._obj is never meant to be set except from self because we can't
         # easily update self if self._obj changes.
@@ -299,15 +525,16 @@ class DeepCollection(metaclass=DynamicSubclasser):
         self, but we also rely on composistion, so self.obj needs to be kept in sync.
 
         This decorator, used in __getattribute__, allows us to passively catch such
-        cases without having to know ahead of time what these methods are. This gives
-        us more generality, and also let's us not have to include such methods in this
-        class. We also don't want an e.g. `append` here unless the parent has it.
+        cases for any parent that has one of the methods named in self._MUTATING,
+        without having to include such methods in this class. We also don't want an
+        e.g. `append` here unless the parent has it.
         """
 
         @wraps(method)
         def wrapped(*args, **kwargs):
             result = method(*args, **kwargs)
-            if self._obj != self:
+            # Comparing lengths first avoids a full deep comparison for most mutations.
+            if len(self._obj) != len(self) or self._obj != self:
                 self._obj = type(self._obj)(self)
             return result
 
@@ -319,9 +546,14 @@ class DeepCollection(metaclass=DynamicSubclasser):
 
         See self._ensure_post_call_sync
         """
-        if name not in dir(DeepCollection) and name in dir(self):
+        cls = type(self)
+        names = _sync_names.get(cls)
+        if names is None:
+            names = _sync_names[cls] = _names_to_sync(cls)
+
+        if name in names:
             method = object.__getattribute__(self, name)
-            if callable(method) and not name.startswith("_"):
+            if callable(method):
                 return self._ensure_post_call_sync(method)
         return object.__getattribute__(self, name)
 
@@ -333,24 +565,29 @@ class DeepCollection(metaclass=DynamicSubclasser):
             raise AttributeError(f"'DeepCollection' object has no attribute '{item}'")
 
     def __getitem__(self, path):
-        def get_raw():
-            # Use self._obj instead of self to avoid unnecessary intermediate
-            # DeepCollections. Just make a final conversion at the end.
-
-            # Assume strs aren't supposed to be iterated through.
-            if _stringlike(path):
-                return self._obj[path]
-
+        # Use self._obj instead of self to avoid unnecessary intermediate
+        # DeepCollections. Just make a final conversion at the end.
+        obj = self._obj
+
+        # Check the common path types first to avoid raising in the iter probe.
+        if isinstance(path, (list, tuple, range)):
+            rv = get_by_path(obj, path)
+        # Assume strs aren't supposed to be iterated through.
+        elif _stringlike(path):
+            rv = obj[path]
+        else:
             try:
                 iter(path)
             except TypeError:
-                return self._obj[path]
-
-            return get_by_path(self._obj, path)
+                rv = obj[path]
+            else:
+                rv = get_by_path(obj, path)
 
-        rv = get_raw()
+        return self._wrap(rv)
 
-        if _can_be_deep(rv) and self.return_deep:
+    def _wrap(self, rv):
+        """Return rv as a DeepCollection if it can be deep and self.return_deep is set."""
+        if self.return_deep and _can_be_deep(rv):
             return DeepCollection(rv)
         return rv
 
@@ -401,3 +638,24 @@ class DeepCollection(metaclass=DynamicSubclasser):
         True
         """
         return deduped_items(list(values_for_field(self, field)))
+
+
+# Names DeepCollection.__getattribute__ wraps, computed once per dynamic class so
+# attribute access needn't call dir().
+_DC_NAMES = frozenset(dir(DeepCollection))
+_sync_names = WeakKeyDictionary()
+
+# Dynamic parents whose mutating methods are all known, in DeepCollection._MUTATING.
+_KNOWN_MUTATORS = frozenset({dict, list, set})
+
+
+def _names_to_sync(cls):
+    """Return the names on cls that DeepCollection.__getattribute__ should wrap with
+    _ensure_post_call_sync. These are the public names inherited from the dynamic
+    parent, rather than those DeepCollection defines itself.
+    """
+    names = frozenset(n for n in dir(cls) if not n.startswith("_")) - _DC_NAMES
+    parent = next(c for c in cls.__mro__ if DeepCollection not in c.__mro__)
+    if parent in _KNOWN_MUTATORS:
+        return names & cls._MUTATING
+    return names
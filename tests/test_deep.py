@@ -1,3 +1,7 @@
+import gc
+import weakref
+from collections import UserList
+
 import pytest
 
 from deep_collection import DeepCollection
@@ -61,3 +65,40 @@ def test_subclass():
     assert isinstance(dc, DeepCollection)
     assert isinstance(dc, dict)
     assert issubclass(Foo, DeepCollection)
+
+
+def test_dynamic_class_reuse():
+    dc = DeepCollection({})
+    assert type(dc) is type(DeepCollection({"a": 1}))
+    assert type(dc) is not type(DeepCollection([]))
+
+
+def test_dynamic_class_not_kept_alive():
+    class Parent(dict):
+        pass
+
+    parent_ref = weakref.ref(Parent)
+    DeepCollection(Parent())
+    del Parent
+    gc.collect()
+
+    assert parent_ref() is None
+
+
+def test_reinitialization_after_metaclass_conflict():
+    DeepCollection(UserList([1]))
+    dc = DeepCollection({"nested": [{"thing": "spam"}]})
+    DeepCollection((1,))
+
+    assert DeepCollection(dc) == dc
+    assert isinstance(DeepCollection(dc), DeepCollection)
+
+
+def test_values_for_compound_field_at_root():
+    data = {"x": {"y": [1]}}
+    dc = DeepCollection(data)
+
+    value = next(dc.values_for_field(["x", "y"]))
+    assert value == [1]
+    assert isinstance(value, DeepCollection)
+    assert value._obj is data["x"]["y"]
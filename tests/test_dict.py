@@ -85,3 +85,12 @@ def test_delitem():
     assert dc == {"deeply": [0, 1, {"nested": {}}]}
     del dc["deeply", 1]
     assert dc == {"deeply": [0, {"nested": {}}]}
+
+
+def test_unchanged_by_mutator_keeps_obj():
+    d = {"a": 1}
+    dc = DeepCollection(d)
+
+    dc.setdefault("a", 0)
+    dc["b"] = 2
+    assert d == {"a": 1, "b": 2}
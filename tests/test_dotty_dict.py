@@ -1,8 +1,8 @@
-import dotty_dict
 import pytest
 from dotty_dict import Dotty
 from dotty_dict import dotty
 
+import deep_collection
 from deep_collection import DeepCollection
 
 
@@ -13,11 +13,7 @@ def test_instantiation():
 
 
 def test_Dotty_not_present(mocker):
-    class Missing:
-        def __init__(self, *args, **kwargs):
-            raise ModuleNotFoundError
-
-    mocker.patch.object(dotty_dict, "Dotty", Missing)
+    mocker.patch.object(deep_collection, "_Dotty", None)
 
     with pytest.raises(AttributeError):
         DeepCollection(dotty())
@@ -1,3 +1,6 @@
+from collections import deque
+from collections import UserList
+
 from deep_collection import DeepCollection
 
 
@@ -36,3 +39,31 @@ def test_append():
     dc[0] = "bar"
     assert dc == ["bar"]
     assert dc[0] == "bar"
+
+
+def test_sort():
+    dc = DeepCollection([["b"], ["a"]])
+
+    dc.sort()
+    assert dc == [["a"], ["b"]]
+    assert dc[0, 0] == "a"
+
+
+def test_deque_sync():
+    dc = DeepCollection(deque([1, 2]))
+
+    dc.appendleft(0)
+    assert dc[0] == 0
+    dc.rotate(1)
+    assert dc[0] == 2
+
+
+def test_custom_mutator_sync():
+    class Stack(UserList):
+        def push(self, item):
+            self.data.append(item)
+
+    dc = DeepCollection(Stack([1]))
+
+    dc.push(2)
+    assert dc[-1] == 2
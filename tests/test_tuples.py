@@ -4,3 +4,12 @@ from tests.shared import immutable_sequence_tests
 
 def test_sequence_shared():
     immutable_sequence_tests(DeepCollection((*range(10),)))
+
+
+def test_subclass_init():
+    class Tagged(tuple):
+        def __init__(self, *args, **kwargs):
+            self.tag = "set"
+
+    dc = DeepCollection(Tagged((1, 2)))
+    assert dc.tag == "set"